@@ -1,21 +1,47 @@
-﻿from flask import Flask, redirect, render_template, request,make_response, session, url_for,jsonify, abort,flash
+﻿from flask import Flask, Response, redirect, render_template, request,make_response, session, url_for,jsonify, abort,flash
 from flask_sqlalchemy import SQLAlchemy 
-from models import db, User, Habit, Category, CheckIn
+from models import db, User, Habit, Category, CheckIn, CheckInArchive
+from events import broker
+from cold_storage import archive_check_ins, restore_check_ins, read_archive, archived_notes
+from heatmap import year_heatmap, heatmap_json, heatmap_svg
+from search import init_search, rebuild_search, search
+from bulk import ACTIONS, owned_habit_ids, bulk_archive, bulk_move, bulk_delete
+from read_models import HabitRow, load_habit_rows
+from due import due_habits, iter_due_habits
 from datetime import datetime, date, timedelta
 from flask_migrate import Migrate
+import click
+import os
 import secrets
+import time
+import tracemalloc
 
 app = Flask(__name__)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///data.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'Asadi1385'
+# shared directory for forwarding live events between worker processes
+app.config['EVENTS_SOCKET_DIR'] = os.environ.get('EVENTS_SOCKET_DIR')
+# move an archived habit's check-ins out of check_ins into a compressed blob
+# right away (bulk archives leave that to `flask compact-archives`)
+app.config['COLD_STORAGE_ARCHIVES'] = True
 
 db.init_app(app)
 Migrate = Migrate(app,db)
 
+if app.config['EVENTS_SOCKET_DIR']:
+    broker.configure(app.config['EVENTS_SOCKET_DIR'])
+
 with app.app_context():
     db.create_all()
+    if init_search(db.engine):
+        rebuild_search(db.engine, archived_notes())
+
+def query_archived_habits(user_id):
+    return (Habit.query.filter_by(user_id = user_id, is_archived = True)
+            .options(db.joinedload(Habit.check_in_archive).load_only(CheckInArchive.check_in_count))
+            .order_by(Habit.creation_date.desc()).all())
 
 def query_check_ins(habit_id,order='desc'):
     query = CheckIn.query.filter_by(habit_id = habit_id)
@@ -55,14 +81,19 @@ def details_date(dt):
         return f"{years} year{'s' if years > 1 else ''} ago"
 app.add_template_filter(details_date)
 
-def habit_completion(habit: Habit):
+def habit_completion(habit: Habit, check_ins=None):
     if not habit.last_check_in_date:
         return 0
     expected = 30 // habit.interval
     if expected == 0:
         expected = 1
 
-    actual_check_ins = len([ci for ci in habit.check_ins if ci.is_done])
+    if isinstance(habit, HabitRow):
+        actual_check_ins = habit.done_count
+    else:
+        if check_ins is None:
+            check_ins = habit.check_ins
+        actual_check_ins = len([ci for ci in check_ins if ci.is_done])
 
     return f"{actual_check_ins}/{expected}"
 app.add_template_filter(habit_completion)
@@ -93,17 +124,27 @@ def fill_missed_days(habit):
         current_date += timedelta(days=habit.interval)
     
     habit.last_sync_date = today
+    habit.refresh_next_due_date()
     db.session.commit()
 
+def sync_missed_days(user_id):
+    # only habits not synced today are loaded as full ORM objects
+    today = date.today()
+    stale_habits = Habit.query.filter(
+        Habit.user_id == user_id,
+        Habit.is_archived == False,
+        Habit.last_check_in_date.isnot(None),
+        db.or_(Habit.last_sync_date.is_(None), Habit.last_sync_date != today),
+    ).all()
+    for habit in stale_habits:
+        fill_missed_days(habit)
+
 @app.post("/update")
 def update_habits():
-    habits = Habit.query.filter(Habit.category_id.is_(None)).all()
-    
-    for habit in habits:
-        habit.category_id = 1
+    fixed = Habit.query.filter(Habit.category_id.is_(None)).update({"category_id": 1}, synchronize_session=False)
     
     db.session.commit()
-    flash(f"Fixed {len(habits)} habits", "ok")
+    flash(f"Fixed {fixed} habits", "ok")
     return redirect(url_for("index"))
 
 
@@ -117,15 +158,11 @@ def index():
         session.clear()
         return redirect(url_for("login"))
    
-    user_habits = []
-    archived_habits = []
-    
-    user_habits = Habit.query.filter_by(user_id = user.id, is_archived = False).order_by(Habit.is_main.desc(),Habit.last_check_in_date.desc(),Habit.creation_date.desc()).all()
-    archived_habits = Habit.query.filter_by(user_id = user.id, is_archived = True).order_by(Habit.creation_date.desc()).all()
-    categories = Category.query.all()
+    sync_missed_days(user.id)
 
-    for habit in user_habits:
-        fill_missed_days(habit)
+    user_habits = load_habit_rows(user.id)
+    archived_habits = query_archived_habits(user.id)
+    categories = Category.query.all()
 
     current_year = date.today().year
     message = request.args.get("message")
@@ -299,6 +336,10 @@ def add_habit_route():
 @app.post("/habits/<int:habit_id>/check-in")
 def check_in_route(habit_id):
     habit:Habit = Habit.query.get_or_404(habit_id)
+    if habit.is_archived:
+        # its check-ins may be packed in cold storage, unarchive it first
+        flash(f"{habit.name} is archived, unarchive it to check in","err")
+        return redirect(url_for("index"))
     today = date.today()
     note = (request.form.get("note") or "").strip()
     if note == "":
@@ -317,6 +358,7 @@ def check_in_route(habit_id):
                     last_check_in.note = note
                     try:
                         db.session.commit()
+                        broker.publish(habit.user_id, "check_in", habit_id=habit.id)
                         flash(f"updated '{habit.name}'s CheckIn note from '{old_note}' to: '{note}'","ok")
                         return redirect(url_for("index"))
                     except Exception as e:
@@ -336,6 +378,7 @@ def check_in_route(habit_id):
         habit.longest_streak = habit.streak
 
     habit.last_check_in_date = today
+    habit.refresh_next_due_date()
     
     new_check_in = CheckIn(
         habit_id = habit.id,
@@ -347,6 +390,7 @@ def check_in_route(habit_id):
     try:
         db.session.add(new_check_in)
         db.session.commit()
+        broker.publish(habit.user_id, "check_in", habit_id=habit.id)
         flash(f"checked in on {habit.name},streak:{habit.streak}","ok")
         return redirect(url_for("index"))
     except Exception as e:
@@ -362,8 +406,11 @@ def habit_details(habit_id):
     
     habit: Habit = Habit.query.filter_by(id=habit_id,user_id=user.id).first_or_404()
     check_ins = (CheckIn.query.filter_by(habit_id = habit.id).order_by(CheckIn.check_in_date.asc()).all())
+    if habit.is_archived and habit.check_in_archive:
+        # history lives in cold storage, plus any check-ins made since archiving
+        check_ins = sorted(read_archive(habit.check_in_archive) + check_ins, key=lambda ci: ci.check_in_date)
     
-    check_in_map = {ci.check_in_date: ci.is_done for ci in habit.check_ins}
+    check_in_map = {ci.check_in_date: ci.is_done for ci in check_ins}
     today = date.today()
     days = 90
     calendar_days = []
@@ -381,6 +428,78 @@ def habit_details(habit_id):
         calendar_days = calendar_days,
     )
 
+@app.get("/habits/<int:habit_id>/item")
+def habit_item(habit_id):
+    if "user_id" not in session:
+        abort(403)
+
+    habits = load_habit_rows(session["user_id"], habit_ids=[habit_id])
+    if not habits:
+        abort(404)
+    return render_template("partials/_habit_item.html", habit = habits[0])
+
+@app.get("/archives")
+def archives_sidebar():
+    if "user_id" not in session:
+        abort(403)
+
+    return render_template("partials/_archives.html", archived_habits = query_archived_habits(session["user_id"]))
+
+@app.get("/events")
+def events_stream():
+    if "user_id" not in session:
+        abort(403)
+
+    return Response(
+        broker.stream(session["user_id"]),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/heatmap")
+def year_heatmap_route():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+
+    year = request.args.get("year", date.today().year, type=int)
+    if not 1970 <= year <= date.today().year:
+        abort(400)
+    by_category = request.args.get("group") == "category"
+
+    result = year_heatmap(session["user_id"], year, by_category=by_category)
+    if request.args.get("format") == "svg":
+        return Response(heatmap_svg(result), mimetype="image/svg+xml")
+    return jsonify(heatmap_json(result))
+
+@app.get("/habits/due")
+def due_habits_route():
+    if "user_id" not in session:
+        abort(403)
+
+    today = date.today()
+    return jsonify({
+        "date": today.isoformat(),
+        "habits": [
+            {
+                "id": habit.id,
+                "name": habit.name,
+                "emoji": habit.emoji,
+                "next_due_date": habit.next_due_date.isoformat(),
+                "overdue_days": (today - habit.next_due_date).days,
+            }
+            for habit in due_habits(session["user_id"], on=today)
+        ],
+    })
+
+@app.get("/search")
+def search_route():
+    if "user_id" not in session:
+        abort(403)
+
+    query = request.args.get("q", "").strip()
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    return jsonify({"query": query, "results": search(session["user_id"], query, limit=limit)})
+
 @app.post("/habits/<int:habit_id>/edit")
 def edit_habit_route(habit_id):
     habit: Habit = Habit.query.get_or_404(habit_id)
@@ -391,6 +510,7 @@ def edit_habit_route(habit_id):
 
     habit.emoji = request.form.get("emoji","🔥")
     habit.interval = int(request.form.get("interval", 1))
+    habit.refresh_next_due_date()
     habit.color = request.form.get("color", "#85B2FA")
 
     category_id = request.form.get("category_id")
@@ -402,6 +522,7 @@ def edit_habit_route(habit_id):
 
     try:
         db.session.commit()
+        broker.publish(habit.user_id, "edit", habit_id=habit.id)
         flash(f"'{habit.name}' changed successfully","ok")
         return redirect (url_for("index"))
     except Exception as e:
@@ -413,9 +534,11 @@ def edit_habit_route(habit_id):
 def delete_habit_route(habit_id):
     habit = Habit.query.get_or_404(habit_id)
     name = habit.name
+    user_id = habit.user_id
     try:
-        db.session.delete(habit)
+        bulk_delete([habit_id])
         db.session.commit()
+        broker.publish(user_id, "delete", habit_id=habit_id)
         flash(f"habit {name} deleted successfuly","ok")
         return redirect (url_for("index"))
     except Exception as e:
@@ -423,12 +546,49 @@ def delete_habit_route(habit_id):
         flash(f"Error: {str(e)}","err")
         return redirect (url_for("index"))
         
+@app.post("/habits/bulk")
+def bulk_habits_route():
+    if "user_id" not in session:
+        abort(403)
+
+    action = request.form.get("action")
+    if action not in ACTIONS:
+        return jsonify({"ok": False, "message": f"unknown action '{action}'"}), 400
+
+    category_id = request.form.get("category_id", type=int)
+    if action == "move" and not (category_id and db.session.get(Category, category_id)):
+        return jsonify({"ok": False, "message": "a valid category is required"}), 400
+
+    habit_ids = owned_habit_ids(request.form.getlist("habit_ids", type=int), user_id=session["user_id"])
+    if not habit_ids:
+        return jsonify({"ok": False, "message": "no habits selected"}), 400
+
+    try:
+        run_bulk_action(action, habit_ids, category_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"ok": False, "message": f"Error: {str(e)}"}), 500
+
+    broker.publish(session["user_id"], "bulk", action=action, habit_ids=habit_ids)
+    return jsonify({"ok": True, "message": f"{action}: {len(habit_ids)} habits"})
+
+def run_bulk_action(action, habit_ids, category_id=None):
+    if action in ("archive", "unarchive"):
+        bulk_archive(habit_ids, archived=action == "archive")
+    elif action == "move":
+        bulk_move(habit_ids, category_id)
+    elif action == "delete":
+        bulk_delete(habit_ids)
+
 @app.post("/habits/<int:habit_id>/toggle-main")
 def toggle_main_route(habit_id):
     try:    
         habit: Habit = Habit.query.get_or_404(habit_id)
+        changed_ids = [habit.id]
 
         if not habit.is_main:
+            changed_ids += [h.id for h in Habit.query.filter_by(user_id=habit.user_id, is_main=True).with_entities(Habit.id)]
             Habit.query.filter_by(user_id=habit.user_id, is_main=True).update({"is_main": False})
             habit.is_main = True
             flash(f"{habit.name} is now your main habit", "ok")
@@ -437,6 +597,7 @@ def toggle_main_route(habit_id):
             flash(f"{habit.name} is no longer your main habit", "ok")
         
         db.session.commit()
+        broker.publish(habit.user_id, "main", habit_id=habit.id, habit_ids=changed_ids, is_main=habit.is_main)
         # habits = Habit.query.filter_by(user_id=habit.user_id).order_by(Habit.is_main.desc()).all()
         # msg = f"{habit.name} is now your main habit" if habit.is_main else f"{habit.name} is no longer your main habit"
         
@@ -459,8 +620,16 @@ def toggle_archive_route(habit_id):
     habit.is_archived = not habit.is_archived
     if habit.is_archived:
         habit.archive_date = date.today()
+    else:
+        habit.refresh_next_due_date()
     habit.is_main = False
+    if app.config['COLD_STORAGE_ARCHIVES']:
+        if habit.is_archived:
+            archive_check_ins([habit.id])
+        else:
+            restore_check_ins([habit.id])
     db.session.commit()
+    broker.publish(habit.user_id, "archive", habit_id=habit.id, is_archived=habit.is_archived)
     status = "archived" if habit.is_archived else "unarchived"
     return jsonify({"ok":True,"message": f"Habit {habit.name} is now {status}. "})
 
@@ -474,6 +643,7 @@ def add_note_route(habit_id):
 
     try:
         db.session.commit()
+        broker.publish(habit.user_id, "edit", habit_id=habit.id)
         if habit.description:
             # flash(f"Note for {habit.name}: {description}.","ok")
             # return redirect(url_for("index"))
@@ -564,9 +734,8 @@ def delete_category_route(category_id):
     
     cat:Category = Category.query.get_or_404(category_id)
     try:
-        habits = Habit.query.filter_by(category_id=category_id).all()
-        for habit in habits:
-            habit.category_id = 1 #the first category, called "Not Assigned"
+        #the first category, called "Not Assigned"
+        Habit.query.filter_by(category_id=category_id).update({"category_id": 1}, synchronize_session=False)
         db.session.delete(cat)
         db.session.commit() 
         flash(f"Category: {cat.title} deleted.","ok")
@@ -576,6 +745,101 @@ def delete_category_route(category_id):
         return redirect(url_for("index"))
 
 
+@app.cli.command("compact-archives")
+@click.option("--vacuum", is_flag=True, help="VACUUM afterwards so the database file shrinks too.")
+def compact_archives_command(vacuum):
+    """Move check-ins of already archived habits into cold storage."""
+    before = db.session.query(db.func.count(CheckIn.id)).scalar()
+    habit_ids = [row.id for row in Habit.query.filter_by(is_archived = True).with_entities(Habit.id)]
+    moved = archive_check_ins(habit_ids)
+    db.session.commit()
+    click.echo(f"moved {moved} check-ins of {len(habit_ids)} archived habits, check_ins rows: {before} -> {before - moved}")
+    if vacuum:
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+
+
+@app.cli.command("rebuild-search")
+def rebuild_search_command():
+    """Refill the full-text search index from habits and check-in notes, archived ones included."""
+    rebuild_search(db.engine, archived_notes())
+    click.echo("search index rebuilt")
+
+
+@app.cli.command("bulk-habits")
+@click.argument("action", type=click.Choice(ACTIONS))
+@click.argument("habit_ids", nargs=-1, type=int)
+@click.option("--user-id", type=int, help="Only touch this user's habits (all of them if no ids are given).")
+@click.option("--category-id", type=int, help="Target category for 'move'.")
+def bulk_habits_command(action, habit_ids, user_id, category_id):
+    """Archive, unarchive, delete or move many habits at once."""
+    if action == "move" and not (category_id and db.session.get(Category, category_id)):
+        raise click.UsageError("move needs an existing --category-id")
+    if not habit_ids and user_id is None:
+        raise click.UsageError("give habit ids, --user-id, or both")
+
+    if habit_ids:
+        habit_ids = owned_habit_ids(habit_ids, user_id=user_id)
+    else:
+        habit_ids = db.session.scalars(db.select(Habit.id).where(Habit.user_id == user_id)).all()
+
+    started = datetime.now()
+    run_bulk_action(action, habit_ids, category_id)
+    db.session.commit()
+    click.echo(f"{action}: {len(habit_ids)} habits in {(datetime.now() - started).total_seconds():.3f}s")
+
+
+@app.cli.command("bench-dashboard")
+@click.option("--user-id", type=int, required=True)
+@click.option("--repeat", type=int, default=5)
+def bench_dashboard_command(user_id, repeat):
+    """Compare the dashboard's HabitRow projection against loading full ORM habits."""
+    def orm_path():
+        habits = Habit.query.filter_by(user_id = user_id, is_archived = False).order_by(Habit.is_main.desc(),Habit.last_check_in_date.desc(),Habit.creation_date.desc()).all()
+        # what the templates used to touch
+        for habit in habits:
+            habit.category and habit.category.title
+            [(ci.check_in_date, ci.is_done, ci.note) for ci in habit.check_ins]
+        return habits
+
+    for name, load in (("orm", orm_path), ("projection", lambda: load_habit_rows(user_id))):
+        timings = []
+        for _ in range(repeat):
+            db.session.expunge_all()
+            started = time.perf_counter()
+            load()
+            timings.append(time.perf_counter() - started)
+
+        db.session.expunge_all()
+        tracemalloc.start()
+        result = load()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+        history = sum(len(h.check_ins) if isinstance(h, Habit) else len(h.history_done) for h in result)
+        click.echo(
+            f"{name:>10}: {len(result)} habits, {history} check-ins | "
+            f"median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms | "
+            f"retained {current / 1024:.0f} KiB in {blocks} blocks | peak {peak / 1024:.0f} KiB"
+        )
+        del result
+
+
+@app.cli.command("due-habits")
+@click.option("--date", "on", type=click.DateTime(formats=["%Y-%m-%d"]), help="Defaults to today.")
+@click.option("--batch-size", type=int, default=1000, show_default=True, help="Users per query.")
+def due_habits_command(on, batch_size):
+    """List every user's habits that are due or overdue."""
+    on = on.date() if on else date.today()
+    count = 0
+    for habit in iter_due_habits(on=on, batch_size=batch_size):
+        overdue = (on - habit.next_due_date).days
+        suffix = f" ({overdue} days overdue)" if overdue else ""
+        click.echo(f"user {habit.user_id}\thabit {habit.id}\t{habit.emoji} {habit.name}\tdue {habit.next_due_date}{suffix}")
+        count += 1
+    click.echo(f"{count} habits due on {on}")
+
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0',debug=True)
 
@@ -0,0 +1,91 @@
+"""Time the bulk habit actions on generated data.
+
+    python bench_bulk.py [--habits 1000] [--check-ins 1000000] [--note-every 10] [--compact]
+
+Runs against its own temporary SQLite file (removed at the end), never the
+app's database, with the app's models, search triggers and bulk helpers.
+"""
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import click
+from flask import Flask
+
+from models import db, User, Habit, Category
+from bulk import bulk_archive, bulk_move, bulk_delete
+from cold_storage import archive_check_ins
+from search import init_search
+
+
+@click.command()
+@click.option("--habits", "habit_count", type=int, default=1000, show_default=True)
+@click.option("--check-ins", "check_in_count", type=int, default=1_000_000, show_default=True)
+@click.option("--note-every", type=int, default=10, show_default=True, help="Every n-th check-in gets a note.")
+@click.option("--compact", is_flag=True, help="Also time packing the check-ins into cold storage and back.")
+def main(habit_count, check_in_count, note_every, compact):
+    fd, path = tempfile.mkstemp(prefix="habittracker-bench-", suffix=".db")
+    os.close(fd)
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    try:
+        with app.app_context():
+            db.create_all()
+            init_search(db.engine)
+            run(habit_count, check_in_count, note_every, compact)
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        os.unlink(path)
+
+
+def run(habit_count, check_in_count, note_every, compact):
+    user = User(username="bench", phone_number="bench", password_hash="")
+    category = Category(title="bench")
+    db.session.add_all([user, category])
+    db.session.flush()
+    today = date.today()
+    days = check_in_count // habit_count
+    db.session.execute(db.insert(Habit), [
+        {"user_id": user.id, "name": f"bench habit {n}", "creation_date": today - timedelta(days=days)}
+        for n in range(habit_count)
+    ])
+    habit_ids = db.session.scalars(db.select(Habit.id)).all()
+    # day by day across all habits, so each habit's rows are spread over the
+    # whole table the way a real history is
+    db.session.connection().exec_driver_sql(
+        "INSERT INTO check_ins (habit_id, check_in_date, is_done, note) VALUES (?, ?, ?, ?)",
+        [
+            (habit_id, (today - timedelta(days=day)).isoformat(), day % 3 != 0,
+             f"bench note {day}" if (day * habit_count + n) % note_every == 0 else None)
+            for day in range(days, 0, -1)
+            for n, habit_id in enumerate(habit_ids)
+        ],
+    )
+    db.session.commit()
+    click.echo(f"{len(habit_ids)} habits, {days * len(habit_ids)} check-ins")
+
+    steps = [
+        ("move", lambda: bulk_move(habit_ids, category.id)),
+        ("archive", lambda: bulk_archive(habit_ids, archived=True)),
+        ("unarchive", lambda: bulk_archive(habit_ids, archived=False)),
+    ]
+    if compact:
+        # not part of a bulk action: what `flask compact-archives` does later,
+        # and the unarchive that then has every row to restore
+        steps += [
+            ("archive + compact", lambda: (bulk_archive(habit_ids, archived=True), archive_check_ins(habit_ids))),
+            ("unarchive, compacted", lambda: bulk_archive(habit_ids, archived=False)),
+        ]
+    steps.append(("delete", lambda: bulk_delete(habit_ids)))
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        db.session.commit()
+        click.echo(f"{name:>22}: {time.perf_counter() - started:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from datetime import date
+
+from sqlalchemy import delete, select, update
+
+from models import db, Habit, CheckIn, CheckInArchive
+from cold_storage import restore_check_ins
+from search import unindex_notes
+
+ACTIONS = ("archive", "unarchive", "delete", "move")
+DELETE_CACHE_KIB = 65536
+
+
+def owned_habit_ids(habit_ids, user_id=None):
+    """The subset of `habit_ids` that exist (and belong to `user_id`, if given)."""
+    query = select(Habit.id).where(Habit.id.in_(habit_ids))
+    if user_id is not None:
+        query = query.where(Habit.user_id == user_id)
+    return db.session.scalars(query).all()
+
+
+def bulk_archive(habit_ids, archived=True):
+    """Archive or unarchive many habits with one UPDATE. Does not commit.
+
+    Archiving only flips the flags, the check-ins stay in check_ins until
+    `flask compact-archives` packs them. Unarchiving also restores any
+    habit that was already packed, which is a no-op for the rest.
+    """
+    values = {"is_archived": archived, "is_main": False}
+    if archived:
+        values["archive_date"] = date.today()
+    db.session.execute(
+        update(Habit).where(Habit.id.in_(habit_ids)).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    if not archived:
+        restore_check_ins(habit_ids)
+
+
+def bulk_move(habit_ids, category_id):
+    """Move many habits to a category with one UPDATE. Does not commit."""
+    db.session.execute(
+        update(Habit).where(Habit.id.in_(habit_ids)).values(category_id=category_id),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def bulk_delete(habit_ids):
+    """Delete habits with their check-ins and archives, one DELETE per table.
+
+    Skips the ORM's delete-orphan cascade, which would load and delete
+    every check-in one row at a time. Does not commit.
+    """
+    connection = db.session.connection()
+    # a habit's check-ins are spread over the whole table, so with the default
+    # 2MB page cache the DELETE keeps re-reading the same pages; the cache is
+    # raised on this connection for the statement only, then put back
+    cache_size = connection.exec_driver_sql("PRAGMA cache_size").scalar()
+    connection.exec_driver_sql(f"PRAGMA cache_size = -{DELETE_CACHE_KIB}")
+    try:
+        unindex_notes(habit_ids)
+        for model, column in ((CheckIn, CheckIn.habit_id), (CheckInArchive, CheckInArchive.habit_id), (Habit, Habit.id)):
+            db.session.execute(
+                delete(model).where(column.in_(habit_ids)),
+                execution_options={"synchronize_session": False},
+            )
+    finally:
+        connection.exec_driver_sql(f"PRAGMA cache_size = {cache_size}")
@@ -0,0 +1,183 @@
+import struct
+import zlib
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import delete, func, insert, select
+
+from models import db, CheckIn, CheckInArchive
+from search import INDEX_ARCHIVED_NOTE, unindex_notes
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC = "zstd" if zstandard else "zlib"
+
+DONE = 1
+HAS_NOTE = 2
+
+# julianday() of 0001-01-01 is 1721425.5 and its date.toordinal() is 1
+JULIAN_TO_ORDINAL = 1721424.5
+
+# same attribute names as CheckIn, so templates can take either
+ArchivedCheckIn = namedtuple("ArchivedCheckIn", ["check_in_date", "is_done", "note"])
+
+
+def pack_check_ins(rows):
+    """Pack (date ordinal, is_done, note) rows, oldest first.
+
+    Layout is column-wise, little-endian: count, day deltas (uint32), one
+    flag byte per row, then a uint32 length-prefixed utf-8 string per row
+    that has a note.
+    """
+    deltas = []
+    flags = bytearray()
+    notes = bytearray()
+    previous = 0
+    for ordinal, is_done, note in rows:
+        deltas.append(ordinal - previous)
+        previous = ordinal
+        flag = DONE if is_done else 0
+        if note:
+            encoded = note.encode("utf-8")
+            notes += struct.pack("<I", len(encoded)) + encoded
+            flag |= HAS_NOTE
+        flags.append(flag)
+    count = len(flags)
+    return struct.pack(f"<I{count}I", count, *deltas) + bytes(flags) + bytes(notes)
+
+
+def unpack_rows(raw):
+    """Yield (date ordinal, is_done, note) back out of `pack_check_ins`."""
+    (count,) = struct.unpack_from("<I", raw)
+    offset = 4
+    deltas = struct.unpack_from(f"<{count}I", raw, offset)
+    offset += 4 * count
+    flags = raw[offset:offset + count]
+    offset += count
+
+    ordinal = 0
+    for delta, flag in zip(deltas, flags):
+        ordinal += delta
+        note = None
+        if flag & HAS_NOTE:
+            (length,) = struct.unpack_from("<I", raw, offset)
+            offset += 4
+            note = raw[offset:offset + length].decode("utf-8")
+            offset += length
+        yield ordinal, bool(flag & DONE), note
+
+
+def unpack_check_ins(raw):
+    return [
+        ArchivedCheckIn(date.fromordinal(ordinal), is_done, note)
+        for ordinal, is_done, note in unpack_rows(raw)
+    ]
+
+
+def compress(raw):
+    if CODEC == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return zlib.compress(raw, 9)
+
+
+def decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("this archive was written with zstd, install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def read_archive(archive: CheckInArchive):
+    return unpack_check_ins(decompress(archive.codec, archive.data))
+
+
+def archive_check_ins(habit_ids):
+    """Move the check-ins of these habits into one compressed blob per habit.
+
+    Does not commit. Returns the number of check-in rows moved.
+    """
+    habit_ids = list(habit_ids)
+    if not habit_ids:
+        return 0
+
+    rows_by_habit = {}
+    # a habit archived twice without a restore in between keeps its old blob's rows too
+    for archive in CheckInArchive.query.filter(CheckInArchive.habit_id.in_(habit_ids)):
+        rows_by_habit[archive.habit_id] = list(unpack_rows(decompress(archive.codec, archive.data)))
+
+    # ordinals straight from SQLite, so no per-row date parsing on big histories
+    ordinal = func.cast(func.julianday(CheckIn.check_in_date) - JULIAN_TO_ORDINAL, db.Integer)
+    result = db.session.execute(
+        select(CheckIn.habit_id, ordinal, CheckIn.is_done, CheckIn.note)
+        .where(CheckIn.habit_id.in_(habit_ids))
+    )
+    moved = 0
+    for habit_id, day, is_done, note in result:
+        rows_by_habit.setdefault(habit_id, []).append((day, is_done, note))
+        moved += 1
+    if not moved:
+        return 0
+
+    # deleting the old blobs drops their notes from the search index too, so
+    # every note of the merged rows gets indexed again below
+    db.session.execute(delete(CheckInArchive).where(CheckInArchive.habit_id.in_(rows_by_habit)))
+    db.session.execute(
+        insert(CheckInArchive),
+        [
+            {
+                "habit_id": habit_id,
+                "codec": CODEC,
+                "check_in_count": len(rows),
+                "data": compress(pack_check_ins(sorted(rows, key=lambda row: row[0]))),
+            }
+            for habit_id, rows in rows_by_habit.items()
+        ],
+    )
+    notes = [
+        (note, date.fromordinal(day).isoformat(), habit_id)
+        for habit_id, rows in rows_by_habit.items()
+        for day, is_done, note in rows
+        if note
+    ]
+    if notes:
+        db.session.connection().exec_driver_sql(INDEX_ARCHIVED_NOTE, notes)
+    unindex_notes(habit_ids)
+    db.session.execute(delete(CheckIn).where(CheckIn.habit_id.in_(habit_ids)))
+    return moved
+
+
+def restore_check_ins(habit_ids):
+    """Put archived check-ins back into check_ins. Does not commit."""
+    habit_ids = list(habit_ids)
+    if not habit_ids:
+        return 0
+
+    rows = []
+    for archive in CheckInArchive.query.filter(CheckInArchive.habit_id.in_(habit_ids)):
+        habit_id = archive.habit_id
+        rows.extend(
+            (habit_id, date.fromordinal(ordinal).isoformat(), is_done, note)
+            for ordinal, is_done, note in unpack_rows(decompress(archive.codec, archive.data))
+        )
+    if rows:
+        # plain executemany: the ORM's per-row insert bookkeeping costs more
+        # than the insert itself for a habit with years of history
+        db.session.connection().exec_driver_sql(
+            "INSERT INTO check_ins (habit_id, check_in_date, is_done, note) VALUES (?, ?, ?, ?)", rows
+        )
+    db.session.execute(delete(CheckInArchive).where(CheckInArchive.habit_id.in_(habit_ids)))
+    return len(rows)
+
+
+def archived_notes():
+    """Every note in cold storage, as rows for search.rebuild_search."""
+    return [
+        (note, date.fromordinal(ordinal).isoformat(), archive.habit_id)
+        for archive in CheckInArchive.query
+        for ordinal, is_done, note in unpack_rows(decompress(archive.codec, archive.data))
+        if note
+    ]
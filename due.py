@@ -0,0 +1,45 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from models import db, Habit, User
+
+DUE_COLUMNS = (Habit.id, Habit.user_id, Habit.name, Habit.emoji, Habit.next_due_date)
+
+
+def due_habits(user_id, on=None):
+    """A user's active habits due on or before `on` (default today), most overdue first.
+
+    Served from ix_habits_user_id_is_archived_next_due_date, no habit is
+    loaded just to work out whether it's due.
+    """
+    on = on or date.today()
+    return db.session.execute(
+        select(*DUE_COLUMNS)
+        .where(Habit.user_id == user_id, Habit.is_archived == False, Habit.next_due_date <= on)
+        .order_by(Habit.next_due_date, Habit.id)
+    ).all()
+
+
+def iter_due_habits(on=None, batch_size=1000):
+    """Due habits of every user, by user and then most overdue first.
+
+    Users are paged by id, `batch_size` at a time, and each page is one
+    query seeking ix_habits_user_id_is_archived_next_due_date once per
+    user, so archived and not-yet-due habits are never read.
+    """
+    on = on or date.today()
+    last_user_id = 0
+    while True:
+        user_ids = db.session.scalars(
+            select(User.id).where(User.id > last_user_id).order_by(User.id).limit(batch_size)
+        ).all()
+        if not user_ids:
+            return
+        yield from db.session.execute(
+            select(*DUE_COLUMNS)
+            .where(Habit.user_id.in_(user_ids), Habit.is_archived == False, Habit.next_due_date <= on)
+            # the index's own order, so there's no sort step either
+            .order_by(Habit.user_id, Habit.next_due_date, Habit.id)
+        ).all()
+        last_user_id = user_ids[-1]
@@ -0,0 +1,165 @@
+import atexit
+import json
+import os
+import queue
+import socket
+import threading
+from collections import defaultdict
+
+KEEPALIVE_SECONDS = 20
+# larger events (a bulk action over thousands of habits) go out as a plain
+# "reload", they'd overflow a datagram and aren't worth patching in place
+MAX_PAYLOAD_BYTES = 16384
+
+
+class EventBroker:
+    """Per-user pub/sub for live habit updates (served as SSE by /events).
+
+    Subscribers are plain queues, so an idle stream costs one queue and
+    one blocked generator. Served through wsgi.py (gevent-patched queue,
+    threading and sockets) that generator is a greenlet, so thousands of
+    open tabs don't need a thread each; under `app.run` every tab holds one.
+    With several worker processes, `configure(socket_dir)` a shared
+    directory and events get forwarded between the workers over unix
+    datagram sockets.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._socket = None
+        self._socket_dir = None
+        self._socket_path = None
+        self._socket_pid = None
+
+    def configure(self, socket_dir):
+        self._socket_dir = socket_dir
+
+    def subscribe(self, user_id):
+        self._connect()
+        subscription = queue.Queue()
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id, event_type, **data):
+        payload = json.dumps({"type": event_type, **data}, separators=(",", ":"))
+        if len(payload) > MAX_PAYLOAD_BYTES:
+            payload = json.dumps({"type": "reload"})
+        self._dispatch(user_id, payload)
+        self._connect()
+        if self._socket is not None:
+            self._forward(user_id, payload)
+
+    def stream(self, user_id):
+        subscription = self.subscribe(user_id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    payload = subscription.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # comment line, keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {payload}\n\n"
+        finally:
+            self.unsubscribe(user_id, subscription)
+
+    def _dispatch(self, user_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(payload)
+
+    # ---- optional local-socket fan-out between worker processes ----
+
+    def _connect(self):
+        # bound lazily so every forked worker gets its own socket
+        if self._socket_dir is None or self._socket_pid == os.getpid():
+            return
+        with self._lock:
+            if self._socket_pid == os.getpid():
+                return
+            os.makedirs(self._socket_dir, exist_ok=True)
+            self._prune()
+            self._socket_path = os.path.join(self._socket_dir, f"{os.getpid()}.sock")
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(self._socket_path)
+            self._socket = sock
+            self._socket_pid = os.getpid()
+        atexit.register(self._close)
+        threading.Thread(target=self._listen, args=(sock,), name="event-broker", daemon=True).start()
+
+    def _prune(self):
+        # sockets left by workers that were killed rather than exited
+        # (atexit doesn't run on SIGKILL, e.g. a graceful timeout)
+        for name in os.listdir(self._socket_dir):
+            pid, _, ext = name.partition(".")
+            if ext != "sock" or not pid.isdigit():
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                try:
+                    os.unlink(os.path.join(self._socket_dir, name))
+                except FileNotFoundError:
+                    pass
+            except PermissionError:
+                pass
+
+    def _close(self):
+        # a forked child inherits the parent's atexit list, only unlink our own
+        if self._socket_pid != os.getpid():
+            return
+        try:
+            os.unlink(self._socket_path)
+        except FileNotFoundError:
+            pass
+
+    def _listen(self, sock):
+        while True:
+            message = sock.recv(65536)
+            try:
+                user_id, _, payload = message.decode("utf-8").partition(" ")
+                user_id = int(user_id)
+            except ValueError:
+                # not one of ours, drop it rather than stop forwarding
+                continue
+            self._dispatch(user_id, payload)
+
+    def _forward(self, user_id, payload):
+        message = f"{user_id} {payload}".encode("utf-8")
+        for name in os.listdir(self._socket_dir):
+            path = os.path.join(self._socket_dir, name)
+            if not name.endswith(".sock") or path == self._socket_path:
+                continue
+            try:
+                self._socket.sendto(message, socket.MSG_DONTWAIT, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # the worker that owned it is gone
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                # receiver is backed up, drop rather than stall the request
+                pass
+            except OSError:
+                # anything else, the event is best effort and the write
+                # it announces has already been committed
+                pass
+
+
+broker = EventBroker()
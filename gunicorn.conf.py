@@ -0,0 +1,13 @@
+import os
+
+# gunicorn (run from this directory, it picks this file up by itself)
+wsgi_app = "wsgi:app"
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# open /events streams per worker, each one an idle greenlet
+worker_connections = 5000
+
+# live events published in one worker reach tabs connected to the others;
+# kept inside this checkout so two deployments on one host don't share it
+os.environ.setdefault("EVENTS_SOCKET_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "events"))
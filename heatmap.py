@@ -0,0 +1,206 @@
+import re
+import sys
+import threading
+from array import array
+from datetime import date
+from html import escape
+
+from sqlalchemy import func, select
+
+from models import db, Habit, Category, CheckIn, CheckInArchive
+from cold_storage import JULIAN_TO_ORDINAL, read_archive
+
+EMPTY, MISSED, DONE = 0, 1, 2
+MISSED_COLOR = "#e5e7eb"
+LEVEL_COLORS = ["#ebedf0", "#9be9a8", "#40c463", "#30a14e", "#216e39"]
+
+CACHE_SIZE = 512
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def year_heatmap(user_id, year, by_category=False):
+    """Day x habit status matrix (or done counts per category) for a year.
+
+    Check-ins are only ever added for today, or by fill_missed_days for the
+    days after a habit's last check-in up to its sync, so once the year is
+    over its rows change only through the habit list itself or a sync that
+    crosses the year end. Past years are cached on exactly that.
+    """
+    start = date(year, 1, 1)
+    end = date(year + 1, 1, 1)
+    days = (end - start).days
+
+    habits = db.session.execute(
+        select(Habit.id, Habit.name, Habit.emoji, Habit.color, Habit.category_id, Habit.is_archived,
+               Habit.last_check_in_date, Habit.last_sync_date)
+        .where(Habit.user_id == user_id, Habit.creation_date < end)
+        .order_by(Habit.is_archived, Habit.is_main.desc(), Habit.creation_date, Habit.id)
+    ).all()
+
+    key = None
+    if year < date.today().year:
+        # dates past the year end are all the same to it
+        key = (user_id, year, by_category, tuple(
+            (*h[:6], *(d if d is None or d < end else end for d in h[6:])) for h in habits
+        ))
+        with _cache_lock:
+            cached = _cache.get(key)
+        if cached is not None:
+            return cached
+
+    grid = _habit_grid(habits, start, days)
+    if by_category:
+        result = {"year": year, **_category_grid(habits, grid, days)}
+    else:
+        result = {
+            "year": year,
+            "days": days,
+            "habits": [
+                {"id": h.id, "name": h.name, "emoji": h.emoji, "color": h.color,
+                 "category_id": h.category_id, "cells": grid[h.id]}
+                for h in habits
+            ],
+        }
+
+    if key is not None:
+        with _cache_lock:
+            if key not in _cache and len(_cache) >= CACHE_SIZE:
+                del _cache[next(iter(_cache))]
+            _cache[key] = result
+    return result
+
+
+# cells are built as bit sets (1 missed, 2 done) so a day with both a
+# missed and a done check-in ends up done, without comparing per day
+SEEN_TO_STATUS = bytes.maketrans(bytes([0, 1, 2, 3]), bytes([EMPTY, MISSED, DONE, DONE]))
+
+
+def _habit_grid(habits, start, days):
+    grid = {h.id: bytearray(days) for h in habits}
+    if not grid:
+        return grid
+
+    # one row per habit holding "day offset * 2 + is_done" as "6,9,35,...";
+    # grouping on habit_id alone walks ix_check_ins_habit_id in order with no
+    # temp b-tree, and Python never builds a row per check-in
+    start_julian = start.toordinal() + JULIAN_TO_ORDINAL
+    day = func.cast(func.julianday(CheckIn.check_in_date) - start_julian, db.Integer)
+    rows = db.session.execute(
+        select(CheckIn.habit_id, func.group_concat(day * 2 + func.coalesce(CheckIn.is_done, False)))
+        .where(
+            CheckIn.habit_id.in_(grid),
+            CheckIn.check_in_date >= start,
+            CheckIn.check_in_date < start.replace(year=start.year + 1),
+        )
+        .group_by(CheckIn.habit_id)
+    )
+    for habit_id, values in rows:
+        cells = grid[habit_id]
+        for value in map(int, values.split(",")):
+            cells[value >> 1] |= 1 << (value & 1)
+
+    archived_ids = [h.id for h in habits if h.is_archived]
+    if archived_ids:
+        for archive in CheckInArchive.query.filter(CheckInArchive.habit_id.in_(archived_ids)):
+            cells = grid[archive.habit_id]
+            for ci in read_archive(archive):
+                offset = (ci.check_in_date - start).days
+                if 0 <= offset < days:
+                    cells[offset] |= 2 if ci.is_done else 1
+
+    return {habit_id: bytes(cells).translate(SEEN_TO_STATUS) for habit_id, cells in grid.items()}
+
+
+DONE_ONLY = bytes.maketrans(bytes([EMPTY, MISSED, DONE]), bytes([0, 0, 1]))
+
+
+def _category_grid(habits, grid, days):
+    # each habit row becomes one big int with a 16-bit lane per day, so
+    # summing a category's rows is a handful of int additions, not a loop per day
+    categories = {}
+    lanes = bytearray(2 * days)
+    for h in habits:
+        lanes[0::2] = grid[h.id].translate(DONE_ONLY)
+        total, count = categories.get(h.category_id, (0, 0))
+        categories[h.category_id] = (total + int.from_bytes(lanes, "little"), count + 1)
+
+    result = []
+    for category_id, (total, count) in categories.items():
+        done = array("H")
+        done.frombytes(total.to_bytes(2 * days, "little"))
+        if sys.byteorder == "big":
+            done.byteswap()
+        result.append({"id": category_id, "habits": count, "done": done.tolist()})
+    return {"days": days, "categories": result}
+
+
+CELL_CHARS = bytes.maketrans(bytes([EMPTY, MISSED, DONE]), b"012")
+
+
+def heatmap_json(result):
+    data = dict(result)
+    if "habits" in data:
+        # "0" empty, "1" missed, "2" done, one char per day
+        data["habits"] = [
+            {**h, "cells": h["cells"].translate(CELL_CHARS).decode("ascii")} for h in data["habits"]
+        ]
+    else:
+        titles = dict(db.session.execute(select(Category.id, Category.title)).all())
+        data["categories"] = [
+            {**c, "title": titles.get(c["id"], "Not Assigned")} for c in data["categories"]
+        ]
+    return data
+
+
+RUNS = re.compile(rb"\x01+|\x02+|\x03+|\x04+")
+
+
+def _row_paths(values, colors, x0, y, cell):
+    """Path data per colour for one row: every run of equal days is a
+    stroked horizontal segment, relative to the end of the previous one."""
+    paths = {}
+    ends = {}
+    for run in RUNS.finditer(values):
+        color = colors[values[run.start()]]
+        x = x0 + run.start() * cell
+        width = (run.end() - run.start()) * cell
+        if color in ends:
+            paths[color].append(f"m{x - ends[color]} 0h{width}")
+        else:
+            paths[color] = [f"M{x} {y}h{width}"]
+        ends[color] = x + width
+    return paths
+
+
+def heatmap_svg(result, cell=3, row=14, label_width=160):
+    """One row per habit (or category), drawn as one <path> per row and colour."""
+    days = result["days"]
+    if "habits" in result:
+        rows = [
+            (f"{h['emoji'] or ''} {h['name']}", h["cells"], {MISSED: MISSED_COLOR, DONE: h["color"] or "#85B2FA"})
+            for h in result["habits"]
+        ]
+    else:
+        titles = dict(db.session.execute(select(Category.id, Category.title)).all())
+        level_colors = dict(enumerate(LEVEL_COLORS))
+        rows = []
+        for c in result["categories"]:
+            levels = bytes(0 if not done else min(4, 1 + 4 * done // (c["habits"] + 1)) for done in c["done"])
+            rows.append((titles.get(c["id"], "Not Assigned"), levels, level_colors))
+
+    width = label_width + days * cell
+    height = max(len(rows), 1) * row
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="sans-serif" font-size="10">',
+        f'<rect x="{label_width}" width="{days * cell}" height="{height}" fill="#f8fafc"/>',
+    ]
+    for index, (label, _, _) in enumerate(rows):
+        parts.append(f'<text x="2" y="{index * row + row - 4}">{escape(label)}</text>')
+    parts.append(f'<g fill="none" stroke-width="{row - 4}">')
+    for index, (_, values, colors) in enumerate(rows):
+        for color, segments in _row_paths(values, colors, label_width, index * row + row // 2, cell).items():
+            parts.append(f'<path stroke="{escape(color)}" d="{"".join(segments)}"/>')
+    parts.append("</g></svg>")
+    return "".join(parts)
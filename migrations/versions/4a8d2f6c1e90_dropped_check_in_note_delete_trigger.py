@@ -0,0 +1,32 @@
+"""dropped check-in note delete trigger
+
+Revision ID: 4a8d2f6c1e90
+Revises: 9c41e7b2d0a3
+Create Date: 2026-10-19 17:05:42.190876
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8d2f6c1e90'
+down_revision = '9c41e7b2d0a3'
+branch_labels = None
+depends_on = None
+
+
+# note_search rows of deleted check-ins are removed set-based by
+# search.unindex_notes; the per-row trigger made every check_ins delete read
+# back each deleted row
+def upgrade():
+    op.execute('DROP TRIGGER IF EXISTS check_ins_search_delete')
+
+
+def downgrade():
+    op.execute("""
+    CREATE TRIGGER IF NOT EXISTS check_ins_search_delete AFTER DELETE ON check_ins
+    WHEN old.note IS NOT NULL AND old.note != '' BEGIN
+        DELETE FROM note_search WHERE rowid = old.id;
+    END
+    """)
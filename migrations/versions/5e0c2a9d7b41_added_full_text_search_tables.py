@@ -0,0 +1,118 @@
+"""added full-text search tables
+
+Revision ID: 5e0c2a9d7b41
+Revises: fd3076c16364
+Create Date: 2026-10-19 14:02:36.511920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0c2a9d7b41'
+down_revision = 'fd3076c16364'
+branch_labels = None
+depends_on = None
+
+# FTS5 tables aren't models, so autogenerate doesn't know them (env.py's
+# include_object keeps it from dropping them) and they're written by hand.
+# rowid is habits.id / check_ins.id, "owner" is a "u<user_id>" token, and
+# the 2 and 3 character prefix indexes keep search-as-you-type off full
+# term scans. char(2)/char(3) are stripped, they're search.py's highlight markers.
+TABLES = ('habit_search', 'note_search')
+TRIGGERS = (
+    'habits_search_insert', 'habits_search_update', 'habits_search_delete',
+    'check_ins_search_insert', 'check_ins_search_update', 'check_ins_search_delete',
+)
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE habit_search USING fts5(
+        name, description, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE note_search USING fts5(
+        note, owner, habit_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER habits_search_insert AFTER INSERT ON habits BEGIN
+        INSERT INTO habit_search (rowid, name, description, owner)
+        VALUES (new.id, replace(replace(new.name, char(2), ''), char(3), ''),
+                replace(replace(new.description, char(2), ''), char(3), ''), 'u' || new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER habits_search_update AFTER UPDATE OF name, description ON habits BEGIN
+        DELETE FROM habit_search WHERE rowid = old.id;
+        INSERT INTO habit_search (rowid, name, description, owner)
+        VALUES (new.id, replace(replace(new.name, char(2), ''), char(3), ''),
+                replace(replace(new.description, char(2), ''), char(3), ''), 'u' || new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER habits_search_delete AFTER DELETE ON habits BEGIN
+        DELETE FROM habit_search WHERE rowid = old.id;
+    END
+    """,
+    # only check-ins with a note are indexed, the rest cost one WHEN check
+    """
+    CREATE TRIGGER check_ins_search_insert AFTER INSERT ON check_ins
+    WHEN new.note IS NOT NULL AND new.note != '' BEGIN
+        INSERT INTO note_search (rowid, note, owner, habit_id)
+        SELECT new.id, replace(replace(new.note, char(2), ''), char(3), ''), 'u' || user_id, new.habit_id
+        FROM habits WHERE id = new.habit_id;
+    END
+    """,
+    """
+    CREATE TRIGGER check_ins_search_update AFTER UPDATE OF note ON check_ins BEGIN
+        DELETE FROM note_search WHERE rowid = old.id;
+        INSERT INTO note_search (rowid, note, owner, habit_id)
+        SELECT new.id, replace(replace(new.note, char(2), ''), char(3), ''), 'u' || user_id, new.habit_id
+        FROM habits WHERE id = new.habit_id AND new.note IS NOT NULL AND new.note != '';
+    END
+    """,
+    """
+    CREATE TRIGGER check_ins_search_delete AFTER DELETE ON check_ins
+    WHEN old.note IS NOT NULL AND old.note != '' BEGIN
+        DELETE FROM note_search WHERE rowid = old.id;
+    END
+    """,
+]
+
+FILL = [
+    """
+    INSERT INTO habit_search (rowid, name, description, owner)
+    SELECT id, replace(replace(name, char(2), ''), char(3), ''),
+           replace(replace(description, char(2), ''), char(3), ''), 'u' || user_id
+    FROM habits
+    """,
+    """
+    INSERT INTO note_search (rowid, note, owner, habit_id)
+    SELECT c.id, replace(replace(c.note, char(2), ''), char(3), ''), 'u' || h.user_id, c.habit_id
+    FROM check_ins c JOIN habits h ON h.id = c.habit_id
+    WHERE c.note IS NOT NULL AND c.note != ''
+    """,
+    "INSERT INTO habit_search (habit_search) VALUES ('optimize')",
+    "INSERT INTO note_search (note_search) VALUES ('optimize')",
+]
+
+
+def drop_search():
+    for trigger in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for table in TABLES:
+        op.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def upgrade():
+    # older builds created these at import time without prefix indexes
+    drop_search()
+    for statement in SCHEMA + FILL:
+        op.execute(statement)
+
+
+def downgrade():
+    drop_search()
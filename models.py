@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import Flask
 
@@ -38,6 +38,9 @@ class Category(db.Model):
     
 class Habit(db.Model):
     __tablename__ = 'habits'
+    __table_args__ = (
+        db.Index('ix_habits_user_id_is_archived_next_due_date', 'user_id', 'is_archived', 'next_due_date'),
+    )
 
     id = db.Column(db.Integer, primary_key = True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable = False, index=True )
@@ -56,10 +59,19 @@ class Habit(db.Model):
     description= db.Column(db.String(255), nullable = True)
     updated_at = db.Column(db.DateTime, default = datetime.now, onupdate = datetime.now)
     color = db.Column(db.String(7), default="#85B2FA")
+    next_due_date = db.Column(db.Date, nullable = True, default = date.today)
     
     user = db.relationship('User', back_populates='habits')
     category = db.relationship('Category',back_populates='habits')
     check_ins = db.relationship('CheckIn', back_populates = 'habit', lazy = True, cascade ="all, delete-orphan")
+    check_in_archive = db.relationship('CheckInArchive', back_populates = 'habit', uselist = False, lazy = True, cascade ="all, delete-orphan")
+
+    def refresh_next_due_date(self):
+        # never checked in: due since the day it was created
+        if self.last_check_in_date:
+            self.next_due_date = self.last_check_in_date + timedelta(days=self.interval or 1)
+        else:
+            self.next_due_date = self.creation_date or date.today()
 
 class CheckIn(db.Model):
     __tablename__ = 'check_ins'
@@ -72,3 +84,14 @@ class CheckIn(db.Model):
 
     habit = db.relationship('Habit', back_populates='check_ins')
 
+class CheckInArchive(db.Model):
+    # cold storage: an archived habit's check-ins, packed and compressed into one row
+    __tablename__ = 'check_in_archives'
+
+    habit_id = db.Column(db.Integer, db.ForeignKey('habits.id'), primary_key = True)
+    codec = db.Column(db.String(10), nullable = False)
+    check_in_count = db.Column(db.Integer, default = 0)
+    data = db.Column(db.LargeBinary, nullable = False)
+    created_at = db.Column(db.DateTime, default = datetime.now)
+
+    habit = db.relationship('Habit', back_populates='check_in_archive')
@@ -0,0 +1,96 @@
+from array import array
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import func, select
+
+from models import db, Habit, Category, CheckIn
+from cold_storage import JULIAN_TO_ORDINAL
+
+
+@dataclass(frozen=True, slots=True)
+class HabitRow:
+    """Read-only projection of a Habit with just what the dashboard renders.
+
+    No identity map, instrumentation or lazy loads; the check-in history is
+    two compact arrays instead of a CheckIn object per day.
+    """
+    id: int
+    name: str
+    emoji: str
+    color: str
+    interval: int
+    is_main: bool
+    streak: int
+    longest_streak: int
+    creation_date: date
+    last_check_in_date: date | None
+    description: str | None
+    category_id: int | None
+    category_title: str | None
+    last_note: str | None
+    # oldest first: date ordinals, and a 0/1 done flag per check-in
+    history_days: array
+    history_done: bytes
+
+    @property
+    def done_count(self):
+        return self.history_done.count(1)
+
+    def history(self, last=None):
+        """(check_in_date, is_done) pairs, oldest first, optionally only the last few."""
+        days, done = self.history_days, self.history_done
+        if last:
+            days, done = days[-last:], done[-last:]
+        return [(date.fromordinal(day), bool(flag)) for day, flag in zip(days, done)]
+
+
+def load_habit_rows(user_id, habit_ids=None):
+    """Dashboard habits of a user as HabitRows, in dashboard order, in three queries."""
+    query = (
+        select(
+            Habit.id, Habit.name, Habit.emoji, Habit.color, Habit.interval, Habit.is_main,
+            Habit.streak, Habit.longest_streak, Habit.creation_date, Habit.last_check_in_date,
+            Habit.description, Habit.category_id, Category.title,
+        )
+        .outerjoin(Category, Habit.category_id == Category.id)
+        .where(Habit.user_id == user_id)
+        .order_by(Habit.is_main.desc(), Habit.last_check_in_date.desc(), Habit.creation_date.desc())
+    )
+    if habit_ids is None:
+        query = query.where(Habit.is_archived == False)
+    else:
+        query = query.where(Habit.id.in_(habit_ids))
+    habits = db.session.execute(query).all()
+    if not habits:
+        return []
+    ids = [habit.id for habit in habits]
+
+    # one row per habit holding "date ordinal * 2 + done" as "1476000,1476003,...";
+    # group_concat's order is arbitrary, so sorting the values here is what
+    # puts each history in date order
+    day = func.cast(func.julianday(CheckIn.check_in_date) - JULIAN_TO_ORDINAL, db.Integer)
+    histories = {}
+    for habit_id, values in db.session.execute(
+        select(CheckIn.habit_id, func.group_concat(day * 2 + func.coalesce(CheckIn.is_done, False)))
+        .where(CheckIn.habit_id.in_(ids))
+        .group_by(CheckIn.habit_id)
+    ):
+        values = sorted(map(int, values.split(",")))
+        histories[habit_id] = (array("i", [value >> 1 for value in values]), bytes([value & 1 for value in values]))
+
+    # the note on each habit's most recent done check-in
+    last_done = (
+        select(func.max(CheckIn.id))
+        .where(CheckIn.habit_id.in_(ids), CheckIn.is_done == True)
+        .group_by(CheckIn.habit_id)
+    )
+    last_notes = dict(db.session.execute(
+        select(CheckIn.habit_id, CheckIn.note).where(CheckIn.id.in_(last_done))
+    ).all())
+
+    empty = (array("i"), b"")
+    return [
+        HabitRow(*habit, last_notes.get(habit.id), *histories.get(habit.id, empty))
+        for habit in habits
+    ]
@@ -0,0 +1,229 @@
+import re
+
+from markupsafe import escape, Markup
+from sqlalchemy import bindparam, text
+
+from models import db
+
+# FTS5 tables and the triggers keeping them in sync. rowid is habits.id /
+# check_ins.id and "owner" holds a "u<user_id>" token that every query is
+# ANDed with, so only that user's rows match. Notes of archived check-ins
+# packed into check_in_archives blobs have no check_ins row, so they live in
+# archived_note_search under their own rowids, with an "h<habit_id>" token
+# the blob's delete trigger drops them by. The migrations create the same;
+# init_search covers databases made by db.create_all().
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS habit_search USING fts5(
+    name, description, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS note_search USING fts5(
+    note, owner, habit_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+CREATE TRIGGER IF NOT EXISTS habits_search_insert AFTER INSERT ON habits BEGIN
+    INSERT INTO habit_search (rowid, name, description, owner)
+    VALUES (new.id, replace(replace(new.name, char(2), ''), char(3), ''),
+            replace(replace(new.description, char(2), ''), char(3), ''), 'u' || new.user_id);
+END;
+CREATE TRIGGER IF NOT EXISTS habits_search_update AFTER UPDATE OF name, description ON habits BEGIN
+    DELETE FROM habit_search WHERE rowid = old.id;
+    INSERT INTO habit_search (rowid, name, description, owner)
+    VALUES (new.id, replace(replace(new.name, char(2), ''), char(3), ''),
+            replace(replace(new.description, char(2), ''), char(3), ''), 'u' || new.user_id);
+END;
+CREATE TRIGGER IF NOT EXISTS habits_search_delete AFTER DELETE ON habits BEGIN
+    DELETE FROM habit_search WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS check_ins_search_insert AFTER INSERT ON check_ins
+WHEN new.note IS NOT NULL AND new.note != '' BEGIN
+    INSERT INTO note_search (rowid, note, owner, habit_id)
+    SELECT new.id, replace(replace(new.note, char(2), ''), char(3), ''), 'u' || user_id, new.habit_id
+    FROM habits WHERE id = new.habit_id;
+END;
+CREATE TRIGGER IF NOT EXISTS check_ins_search_update AFTER UPDATE OF note ON check_ins BEGIN
+    DELETE FROM note_search WHERE rowid = old.id;
+    INSERT INTO note_search (rowid, note, owner, habit_id)
+    SELECT new.id, replace(replace(new.note, char(2), ''), char(3), ''), 'u' || user_id, new.habit_id
+    FROM habits WHERE id = new.habit_id AND new.note IS NOT NULL AND new.note != '';
+END;
+-- no delete trigger on check_ins, see unindex_notes
+DROP TRIGGER IF EXISTS check_ins_search_delete;
+CREATE VIRTUAL TABLE IF NOT EXISTS archived_note_search USING fts5(
+    note, owner, habit, habit_id UNINDEXED, check_in_date UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+CREATE TRIGGER IF NOT EXISTS check_in_archives_search_delete AFTER DELETE ON check_in_archives BEGIN
+    DELETE FROM archived_note_search WHERE rowid IN (
+        SELECT rowid FROM archived_note_search WHERE archived_note_search MATCH 'habit : "h' || old.habit_id || '"'
+    );
+END;
+"""
+
+# blobs can't be read from SQL, so cold_storage indexes a blob's notes as it
+# writes it, one (note, check_in_date, habit_id) row per noted check-in
+INDEX_ARCHIVED_NOTE = """
+INSERT INTO archived_note_search (note, owner, habit, habit_id, check_in_date)
+SELECT replace(replace(?, char(2), ''), char(3), ''), 'u' || user_id, 'h' || id, id, ?
+FROM habits WHERE id = ?
+"""
+
+REBUILD = """
+DELETE FROM habit_search;
+INSERT INTO habit_search (rowid, name, description, owner)
+SELECT id, replace(replace(name, char(2), ''), char(3), ''),
+       replace(replace(description, char(2), ''), char(3), ''), 'u' || user_id
+FROM habits;
+DELETE FROM note_search;
+INSERT INTO note_search (rowid, note, owner, habit_id)
+SELECT c.id, replace(replace(c.note, char(2), ''), char(3), ''), 'u' || h.user_id, c.habit_id
+FROM check_ins c JOIN habits h ON h.id = c.habit_id
+WHERE c.note IS NOT NULL AND c.note != '';
+DELETE FROM archived_note_search;
+"""
+
+OPTIMIZE = """
+INSERT INTO habit_search (habit_search) VALUES ('optimize');
+INSERT INTO note_search (note_search) VALUES ('optimize');
+INSERT INTO archived_note_search (archived_note_search) VALUES ('optimize');
+"""
+
+TABLES = ("habit_search", "note_search", "archived_note_search")
+
+# highlight markers; the triggers and REBUILD strip them from everything they
+# index, so a note can't smuggle its own <mark> tags into a snippet
+MARK_START, MARK_END = "\x02", "\x03"
+
+# the tables have 2 and 3 character prefix indexes; a one letter prefix
+# would expand to every term starting with it, across every user
+MIN_PREFIX_LENGTH = 2
+
+
+def init_search(engine):
+    """Create whatever search tables/triggers are missing.
+
+    Returns True if a table was missing, the caller then fills them with rebuild_search.
+    """
+    raw = engine.raw_connection()
+    try:
+        tables = raw.driver_connection.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?, ?)", TABLES
+        ).fetchone()[0]
+        raw.driver_connection.executescript(SCHEMA)
+        raw.driver_connection.commit()
+    finally:
+        raw.close()
+    return tables < len(TABLES)
+
+
+def rebuild_search(engine, archived_notes=()):
+    """Refill every search table; `archived_notes` as for INDEX_ARCHIVED_NOTE."""
+    raw = engine.raw_connection()
+    try:
+        raw.driver_connection.executescript(SCHEMA + REBUILD)
+        raw.driver_connection.executemany(INDEX_ARCHIVED_NOTE, archived_notes)
+        raw.driver_connection.executescript(OPTIMIZE)
+        raw.driver_connection.commit()
+    finally:
+        raw.close()
+
+
+def unindex_notes(habit_ids):
+    """Drop these habits' check-in notes from note_search. Does not commit.
+
+    Call it before deleting their check_ins rows. A delete trigger would
+    make SQLite read back every deleted row, on a bulk delete that costs
+    more than the DELETE itself, so there is none.
+    """
+    db.session.execute(
+        text("DELETE FROM note_search WHERE habit_id IN :habit_ids").bindparams(
+            bindparam("habit_ids", expanding=True)
+        ),
+        {"habit_ids": list(habit_ids)},
+    )
+
+
+def match_query(query):
+    """Turn free text into a safe FTS5 query: every word must match, the last as a prefix.
+
+    A trailing single letter is still being typed and is left out.
+    """
+    words = re.findall(r"\w+", query)
+    if words and len(words[-1]) < MIN_PREFIX_LENGTH:
+        words.pop()
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlighted(fragment):
+    return Markup(
+        str(escape(fragment or "")).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+    )
+
+
+def search(user_id, query, limit=20):
+    """Habits and check-in notes of one user matching `query`, best first."""
+    match = match_query(query)
+    if match is None:
+        return []
+    params = {"owner": f'owner : "u{user_id}"', "limit": limit, "start": MARK_START, "end": MARK_END}
+
+    habits = db.session.execute(text("""
+        SELECT rowid, bm25(habit_search, 10.0, 1.0, 0.0) AS score,
+               highlight(habit_search, 0, :start, :end) AS name,
+               snippet(habit_search, 1, :start, :end, '…', 12) AS description
+        FROM habit_search
+        WHERE habit_search MATCH :owner || ' AND {name description} : (' || :match || ')'
+        ORDER BY score LIMIT :limit
+    """), {**params, "match": match}).all()
+
+    # archived check-ins have no check_ins row (check_in_id is NULL), their
+    # index rows carry the date themselves
+    notes = db.session.execute(text("""
+        SELECT n.rowid AS check_in_id, n.score, n.snippet, n.habit_id, c.check_in_date, h.name, h.emoji
+        FROM (
+            SELECT rowid, habit_id, bm25(note_search, 1.0, 0.0) AS score,
+                   snippet(note_search, 0, :start, :end, '…', 16) AS snippet
+            FROM note_search
+            WHERE note_search MATCH :owner || ' AND note : (' || :match || ')'
+            ORDER BY score LIMIT :limit
+        ) n
+        JOIN check_ins c ON c.id = n.rowid
+        JOIN habits h ON h.id = n.habit_id
+        UNION ALL
+        SELECT NULL, a.score, a.snippet, a.habit_id, a.check_in_date, h.name, h.emoji
+        FROM (
+            SELECT habit_id, check_in_date, bm25(archived_note_search, 1.0, 0.0, 0.0) AS score,
+                   snippet(archived_note_search, 0, :start, :end, '…', 16) AS snippet
+            FROM archived_note_search
+            WHERE archived_note_search MATCH :owner || ' AND note : (' || :match || ')'
+            ORDER BY score LIMIT :limit
+        ) a
+        JOIN habits h ON h.id = a.habit_id
+        ORDER BY score
+    """), {**params, "match": match}).all()
+
+    results = [
+        {
+            "kind": "habit",
+            "habit_id": row.rowid,
+            "score": row.score,
+            "title": _highlighted(row.name),
+            "snippet": _highlighted(row.description),
+        }
+        for row in habits
+    ] + [
+        {
+            "kind": "note",
+            "habit_id": row.habit_id,
+            "check_in_id": row.check_in_id,
+            "score": row.score,
+            "title": escape(f"{row.emoji or ''} {row.name}".strip()),
+            "snippet": _highlighted(row.snippet),
+            "date": row.check_in_date,
+        }
+        for row in notes
+    ]
+    results.sort(key=lambda result: result["score"])
+    return results[:limit]
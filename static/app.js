@@ -31,18 +31,19 @@ document.getElementById("add-habit-btn").addEventListener("click", function () {
   addHabitTable.classList.toggle("hidden");
 });
 
-// Event listeners for Edit buttons to open modal
-document.querySelectorAll(".edit-btn").forEach((button) => {
-  button.addEventListener("click", () => {
-    const habitId = button.getAttribute("data-id");
-    const name = button.getAttribute("data-name");
-    const interval = button.getAttribute("data-interval");
-    const emoji = button.getAttribute("data-emoji");
-    const color = button.getAttribute("data-color");
-    const categoryId = button.getAttribute("data-category-id");
-
-    openModal(habitId, name, interval, emoji, color, categoryId);
-  });
+// Event listener for Edit buttons to open modal (delegated, habit items get swapped live)
+document.addEventListener("click", (e) => {
+  const button = e.target.closest(".edit-btn");
+  if (!button) return;
+
+  const habitId = button.getAttribute("data-id");
+  const name = button.getAttribute("data-name");
+  const interval = button.getAttribute("data-interval");
+  const emoji = button.getAttribute("data-emoji");
+  const color = button.getAttribute("data-color");
+  const categoryId = button.getAttribute("data-category-id");
+
+  openModal(habitId, name, interval, emoji, color, categoryId);
 });
 document
   .getElementById("edit-profile-btn")
@@ -178,7 +179,8 @@ document.addEventListener("DOMContentLoaded", function () {
   confirmationDialogs();
   updateLeftSidebar();
   HabitDetailsButton();
-
+  LiveHabitUpdates();
+  SearchBox();
 });
 function showFlash(msg, category) {
   const msgBox = document.createElement("div");
@@ -190,7 +192,6 @@ function showFlash(msg, category) {
 }
 
 function HabitDetailsButton() {
-  const detailsButtons = document.querySelectorAll(".details-btn");
   const detailsSidebar = document.getElementById("details-sidebar");
   const detailsContent = document.getElementById("details-content");
 
@@ -201,48 +202,48 @@ function HabitDetailsButton() {
   // track the current habit in the details sidebar
   detailsSidebar.dataset.currentHabit = "";
 
-  detailsButtons.forEach((btn) => {
-    btn.addEventListener("click", async () => {
-      const habitId = btn.dataset.habitId;
-      if (!habitId) {
-        return console.warn("button missing habit id");
-      }
-
-      const currentHabit = detailsSidebar.dataset.currentHabit;
-      const isOpen = !detailsSidebar.classList.contains("hidden");
+  document.addEventListener("click", async (e) => {
+    const btn = e.target.closest(".details-btn");
+    if (!btn) return;
+    const habitId = btn.dataset.habitId;
+    if (!habitId) {
+      return console.warn("button missing habit id");
+    }
 
-      if (isOpen && currentHabit === habitId) {
-        detailsSidebar.classList.add("hidden");
-        detailsSidebar.dataset.currentHabit = "";
-        updateLeftSidebar();
-        return;
-      }
+    const currentHabit = detailsSidebar.dataset.currentHabit;
+    const isOpen = !detailsSidebar.classList.contains("hidden");
 
-      detailsSidebar.dataset.currentHabit = habitId;
-      detailsContent.innerHTML = "<P>loading details...</P>";
-      detailsSidebar.classList.remove("hidden");
+    if (isOpen && currentHabit === habitId) {
+      detailsSidebar.classList.add("hidden");
+      detailsSidebar.dataset.currentHabit = "";
       updateLeftSidebar();
+      return;
+    }
 
-      try {
-        const res = await fetch(`/habits/${habitId}/details`);
-
-        if (!res.ok) {
-          const text = await res.text();
-          throw new Error(
-            `Server error: ${res.status} - ${text || res.statusText}`,
-          );
-        }
+    detailsSidebar.dataset.currentHabit = habitId;
+    detailsContent.innerHTML = "<P>loading details...</P>";
+    detailsSidebar.classList.remove("hidden");
+    updateLeftSidebar();
 
-        const htmlContent = await res.text();
+    try {
+      const res = await fetch(`/habits/${habitId}/details`);
 
-        detailsContent.innerHTML = htmlContent;
-        detailsSidebar.classList.remove("hidden");
-        wireUpDetailsCloseButton(detailsSidebar);
-      } catch (err) {
-        console.error("Error fetching habit's details:", err);
-        detailsContent.innerHTML = `<P style="color:red;">Error </P>`;
+      if (!res.ok) {
+        const text = await res.text();
+        throw new Error(
+          `Server error: ${res.status} - ${text || res.statusText}`,
+        );
       }
-    });
+
+      const htmlContent = await res.text();
+
+      detailsContent.innerHTML = htmlContent;
+      detailsSidebar.classList.remove("hidden");
+      wireUpDetailsCloseButton(detailsSidebar);
+    } catch (err) {
+      console.error("Error fetching habit's details:", err);
+      detailsContent.innerHTML = `<P style="color:red;">Error </P>`;
+    }
   });
 }
 
@@ -334,19 +335,176 @@ function confirmationDialogs() {
     if (e.target === modal) closeConfirmModal();
   });
 
-  document.querySelectorAll("form.confirmation-required").forEach((form) => {
-    form.addEventListener("submit", (e) => {
-      e.preventDefault();
-
-      const title = form.dataset.confirmTitle;
-      const message = form.dataset.confirmMessage;
-      openConfirmModal({
-        title,
-        message,
-        onConfirm: () => {
-          form.submit();
-        },
-      });
+  document.addEventListener("submit", (e) => {
+    const form = e.target.closest("form.confirmation-required");
+    if (!form) return;
+    e.preventDefault();
+
+    const title = form.dataset.confirmTitle;
+    const message = form.dataset.confirmMessage;
+    openConfirmModal({
+      title,
+      message,
+      onConfirm: () => {
+        form.submit();
+      },
     });
   });
 }
+
+// keep this tab in sync with check-ins/edits made on other devices
+function LiveHabitUpdates() {
+  const habitList = document.getElementById("habit-list");
+  if (!habitList || !window.EventSource) return;
+
+  const findItem = (habitId) =>
+    habitList.querySelector(`.habit-item[data-habit-id="${habitId}"]`);
+
+  async function swapHabitItem(habitId) {
+    const res = await fetch(`/habits/${habitId}/item`);
+    if (!res.ok) return null;
+
+    const template = document.createElement("template");
+    template.innerHTML = (await res.text()).trim();
+    const newItem = template.content.firstElementChild;
+    const oldItem = findItem(habitId);
+    if (oldItem) {
+      oldItem.replaceWith(newItem);
+    } else {
+      habitList.appendChild(newItem);
+    }
+    if (window.htmx) htmx.process(newItem);
+    return newItem;
+  }
+
+  // same order as the dashboard query: main habit first, then the latest
+  // check-in, then the newest habit (data-sort-key is "main|last|created")
+  function sortHabitList() {
+    const items = [...habitList.querySelectorAll(".habit-item")];
+    items.sort((a, b) => {
+      const keyA = a.dataset.sortKey;
+      const keyB = b.dataset.sortKey;
+      return keyA < keyB ? 1 : keyA > keyB ? -1 : 0;
+    });
+    habitList.append(...items);
+    // the list can go from empty to not (or back) without a page load
+    document.getElementById("habits-header")?.classList.toggle("hidden", !items.length);
+    document.getElementById("habits-empty")?.classList.toggle("hidden", !!items.length);
+  }
+
+  async function refreshArchives() {
+    const oldSidebar = document.getElementById("archives-sidebar");
+    if (!oldSidebar) return;
+    const res = await fetch("/archives");
+    if (!res.ok) return;
+
+    const template = document.createElement("template");
+    template.innerHTML = (await res.text()).trim();
+    const newSidebar = template.content.firstElementChild;
+    newSidebar.classList.toggle("hidden", oldSidebar.classList.contains("hidden"));
+    oldSidebar.replaceWith(newSidebar);
+  }
+
+  const source = new EventSource("/events");
+  source.onmessage = async (e) => {
+    try {
+      const event = JSON.parse(e.data);
+      switch (event.type) {
+        case "reload":
+          // too big to patch in place (see events.MAX_PAYLOAD_BYTES)
+          window.location.reload();
+          return;
+        case "check_in":
+        case "edit":
+          if (findItem(event.habit_id)) await swapHabitItem(event.habit_id);
+          break;
+        case "main":
+          for (const habitId of event.habit_ids) {
+            const item = findItem(habitId);
+            if (item) await swapHabitItem(habitId);
+          }
+          break;
+        case "archive":
+          if (event.is_archived) {
+            findItem(event.habit_id)?.remove();
+          } else {
+            await swapHabitItem(event.habit_id);
+          }
+          await refreshArchives();
+          break;
+        case "delete":
+          findItem(event.habit_id)?.remove();
+          await refreshArchives();
+          break;
+        case "bulk":
+          for (const habitId of event.habit_ids) {
+            if (event.action === "move") {
+              if (findItem(habitId)) await swapHabitItem(habitId);
+            } else if (event.action === "unarchive") {
+              await swapHabitItem(habitId);
+            } else {
+              findItem(habitId)?.remove();
+            }
+          }
+          if (event.action !== "move") await refreshArchives();
+          break;
+      }
+      sortHabitList();
+    } catch (err) {
+      console.error("live update failed:", err);
+    }
+  };
+}
+
+// full-text search over habits and check-in notes
+function SearchBox() {
+  const input = document.getElementById("search-input");
+  const resultsList = document.getElementById("search-results");
+  if (!input || !resultsList) return;
+
+  let timer = null;
+  let controller = null;
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(runSearch, 200);
+  });
+
+  async function runSearch() {
+    const query = input.value.trim();
+    // search.py's MIN_PREFIX_LENGTH: one letter would match almost everything
+    if (query.length < 2) {
+      resultsList.classList.add("hidden");
+      return;
+    }
+    if (controller) controller.abort();
+    controller = new AbortController();
+
+    try {
+      const res = await fetch(`/search?q=${encodeURIComponent(query)}`, {
+        signal: controller.signal,
+      });
+      const data = await res.json();
+      // title and snippet come back escaped, with <mark> around the matches
+      resultsList.innerHTML = data.results.length
+        ? data.results
+            .map(
+              (result) => `
+          <li class="search-result details-btn" data-habit-id="${result.habit_id}">
+            <strong>${result.title}</strong>
+            ${result.snippet ? `<div>${result.snippet}</div>` : ""}
+            <div class="search-result-meta">${result.kind === "note" ? `Check-in note · ${result.date}` : "Habit"}</div>
+          </li>`,
+            )
+            .join("")
+        : `<li class="search-result-meta">No matches.</li>`;
+      resultsList.classList.remove("hidden");
+    } catch (err) {
+      if (err.name !== "AbortError") console.error("search failed:", err);
+    }
+  }
+
+  document.addEventListener("click", (e) => {
+    if (!e.target.closest(".search-box")) resultsList.classList.add("hidden");
+  });
+}
@@ -0,0 +1,14 @@
+from gevent import monkey
+
+# before anything imports queue/threading/socket, so /events streams are
+# greenlets instead of one OS thread per open tab
+monkey.patch_all()
+
+import os  # noqa: E402
+
+from app import app  # noqa: E402
+
+if __name__ == "__main__":
+    from gevent.pywsgi import WSGIServer
+
+    WSGIServer(("0.0.0.0", int(os.environ.get("PORT", 5000))), app).serve_forever()